@@ -1,18 +1,27 @@
 # -*- coding: utf-8 -*-
 
-import clr
 import sys
 import os
 
-# Agrega directorio "lib\Attenuator" al path para buscar dlls
-sys.path.append(os.path.join(os.path.dirname(__file__), "lib"))
+__author__ = "Braulio Ríos"
 
-# Agregar dlls de C# (wrappers para el driver del atenuador: mcl_RUDAT.dll)
-clr.AddReferenceToFile("AttenuatorCSharpWrapper.dll")
+_LIB_PATH = os.path.join(os.path.dirname(__file__), "lib")
+_DLL_LOADED = globals().get("_DLL_LOADED", False)  # reload() conserva las variables del modulo
 
-import AttenuatorCSharpWrapper.Attenuator
 
-__author__ = "Braulio Ríos"
+# Carga el wrapper de C# la primera vez que se usa un atenuador (no al importar el modulo, para no iniciar el CLR)
+def _load_wrapper():
+    global _DLL_LOADED
+    import clr
+    if not _DLL_LOADED:
+        # Agrega directorio "lib\Attenuator" al path para buscar dlls (una sola vez)
+        if _LIB_PATH not in sys.path:
+            sys.path.append(_LIB_PATH)
+        # Agregar dlls de C# (wrappers para el driver del atenuador: mcl_RUDAT.dll)
+        clr.AddReferenceToFile("AttenuatorCSharpWrapper.dll")
+        _DLL_LOADED = True
+    import AttenuatorCSharpWrapper.Attenuator
+    return AttenuatorCSharpWrapper
 
 
 # Based on RCDAT-6000-60 Attenuator
@@ -21,7 +30,7 @@ class RCDATAttenuator:
     debug = True
 
     def __init__(self):
-        self.attenuator = AttenuatorCSharpWrapper.Attenuator()
+        self.attenuator = _load_wrapper().Attenuator()
         if not self.attenuator.IsConnected():
             raise RuntimeError("Attenuator is not connected")
         if self.debug:
@@ -4,7 +4,12 @@ This package requires the Visa folder and NIVISA DLL libraries installed.
 See "_doc\Visa\" for information and installers of Visa.
 
 Use example:
-TODO
+from Oscilloscope.AgilentOscilloscope import AgilentOscilloscopeDSO1002A
+oscilloscope = AgilentOscilloscopeDSO1002A()  # Finds the first connected device
+time_s, ch1_v, ch2_v = oscilloscope.get_single_shoot(trigger_channel=1, trigger_level=1.5, time_scale="200us",
+                                                     channel_1_y_scale=1, channel_2_y_scale=1)
+
+The captured samples are returned as numpy arrays (seconds in float64, volts in float32), None for disabled channels.
 
 See "_doc\Oscilloscope" to find the Agilent Oscilloscope 1000 series User Guide, where the commands
 implemented here are based, and more available commands are described.
@@ -12,36 +17,60 @@ implemented here are based, and more available commands are described.
 The software tool 'VISA Interactive Control' (installed with NIVISA), allows searching for connected devices,
 and the resource string can be used during initialization, for example:
 
-rf_generator = AgilentRFGenerator("USB0::0x0957::0x2018::0115000733::INSTR")
+oscilloscope = AgilentOscilloscopeDSO1002A("USB0::<vendor id>::<product id>::<serial number>::INSTR")
 
 """
 
 from __future__ import print_function
 from ctypes import *
-from Visa import VisaLibrary
+import numpy as np
 import time
 
 __author__ = "Braulio Ríos"
 
+# Frequently used commands, already encoded and terminated (sent as they are by _write_bytes())
+_CMD_RESET = b"*RST\n"
+_CMD_RUN = b":RUN\n"
+_CMD_SINGLE = b":SINGLE\n"
+_CMD_STOP = b":STOP\n"
+_CMD_FORCE_TRIGGER = b":FORCETRIG\n"
+_CMD_TRIGGER_STATUS = b":TRIGGER:STATUS?\n"
+
+# Multipliers of the units accepted by freq_string_to_value() and time_string_to_value() (lower case)
+_FREQUENCY_UNITS = {"ghz": 1e9, "mhz": 1e6, "khz": 1e3}
+_TIME_UNITS = {"ns": 1e-9, "us": 1e-6, "ms": 1e-3}
+# Valid probe attenuation values (see attenuation_value_to_string())
+_PROBES_ATTENUATION = {0.001: "0.001X", 0.01: "0.01X", 0.1: "0.1X", 1: "1X", 10: "10X", 100: "100X", 1000: "1000X"}
+
 
 # Agilent Oscilloscope DSO1002A
 class AgilentOscilloscopeDSO1002A:
 
     # Public members
-    debug = True  # Print all write / read operations
+    debug = False  # Print all write / read operations
+    # If True, the arrays returned by get_single_shoot() are reused (overwritten) by the next capture of the
+    # same channel, avoiding new allocations in repetitive captures. Copy them if they must be kept.
+    reuse_buffers = False
 
     # Private members
     _device = None
-    _BUFFER_SIZE = 2048
-    _buffer = create_string_buffer(_BUFFER_SIZE)
-    _ret_count = c_uint32()
+    _visa = None  # Visa.VisaLibrary module, imported on initialization
+    _wav_format = None  # Last waveform format set (":WAV:FORMAT"), None if unknown
+    _BUFFER_SIZE = 1 << 20  # Big enough to read a whole waveform in one viRead (see set_chunk_size())
+    _buffer = None  # Read buffer, created on initialization (one per device)
+    _ret_count = None  # Bytes count of the last viWrite / viRead, created on initialization
 
     def __init__(self, resource_string="*"):
+        self._buffer = create_string_buffer(self._BUFFER_SIZE)
+        self._ret_count = c_uint32()
+        # Imported here (not on module import) so that the VISA DLL is loaded only when a device is used
+        from Visa import VisaLibrary
+        self._visa = VisaLibrary
         # Find a device connected containing the "INSTR" string
         if resource_string == "*":
             connected_devices = VisaLibrary.list_devices()
             for device in connected_devices:
-                if device.find("INSTR") >= 0 and device.find("USB0") >= 0:
+                if device.find(b"INSTR") >= 0 and device.find(b"USB0") >= 0:
                     if resource_string != "*":
                         raise RuntimeError("More than one connected device found. Resource string must be provided.")
                     resource_string = device
@@ -49,61 +78,91 @@ class AgilentOscilloscopeDSO1002A:
         if resource_string == "*":
             raise RuntimeError("No Oscilloscope found. Check that device is connected using VISA Interactive Control")
         self._device = VisaLibrary.open_device(resource_string)
-
-    # Send a generic command (see N9310A User's Guide)
+        # Values queried to the oscilloscope that remain valid until the configuration is changed
+        self._axis_reference_cache = {}  # {channel: (xorigin, xincrement, yorigin, yincrement, yreference)}
+        self._scale_cache = {}  # {channel: vertical scale in Volts}
+        # Arrays reused in samples_values_from_buffer()
+        self._sample_indexes = np.arange(0, dtype=np.float64)
+        self._samples_buffers = {}  # {channel: (t_seconds, y_volts)}, only used if reuse_buffers is True
+        # Settings applied by the last get_single_shoot(), None if they may have changed since then
+        self._last_setup = None
+
+    # Send a generic command (see Programmer's Guide)
     def write(self, command):
+        # Convert command from str to bytes array (only necessary in Python 3)
+        if not isinstance(command, bytes):
+            command = command.encode()
         # Append final line break if not present
-        if command[-1] != "\n":
-            command += "\n"
-        # Print command
-        if self.debug:
-            print("Sending command: \"%s\"..." % command[0:-1], end=' ')  # Remove line break to print
+        if not command.endswith(b"\n"):
+            command += b"\n"
+        self._write_bytes(command)
+
+    # Send several commands in a single message, separated by ";" (e.g: [":STOP", ":CHAN1:DISP ON"])
+    def write_batch(self, commands):
+        self.write(";".join(commands))
+
+    # Send a command already encoded as bytes and terminated with line break (e.g: the _CMD_* constants)
+    def _write_bytes(self, command):
+        command_length = len(command)
         # Write
-        if VisaLibrary.visa.viWrite(self._device, command, len(command), byref(self._ret_count)) < 0:
+        if self._visa.visa.viWrite(self._device, command, command_length, byref(self._ret_count)) < 0:
             raise RuntimeError("Could not write data to device")
         # Check length
-        if self._ret_count.value != len(command):
-            raise RuntimeError("Length written is different from expected. Command length: %d bytes / %d bytes written",
-                               len(command), self._ret_count)
-        print("OK.")
+        if self._ret_count.value != command_length:
+            raise RuntimeError("Length written is different from expected. Command length: %d bytes / %d bytes written"
+                               % (command_length, self._ret_count.value))
+        # Print command (once written, in a single print call)
+        if self.debug:
+            print("Sending command: \"%s\"... OK." % command[0:-1].decode())  # Remove line break to print
 
-    # Read response as a string
+    # Read response as bytes
+    # The buffer is trimmed by the number of bytes read (not by the first null character), so binary data
+    # like WORD samples is not truncated
     def read(self):
         # Read
-        ret_code = VisaLibrary.visa.viRead(self._device, self._buffer, self._BUFFER_SIZE, byref(self._ret_count))
+        ret_code = self._visa.visa.viRead(self._device, self._buffer, self._BUFFER_SIZE, byref(self._ret_count))
         if ret_code < 0:
             raise RuntimeError("Could not read data from device. Return code: %d" % ret_code)
-        # Trim buffer into a string
-        response = self._buffer.value[0:self._ret_count.value]
+        # Trim buffer (copy only the bytes read, .raw would copy the whole buffer)
+        response = string_at(self._buffer, self._ret_count.value)
         # Print response
         if self.debug:
             print("Response: %s " % response)
         return response
 
+    # Set the maximum number of bytes read in each viRead call (the whole response must fit in it)
+    def set_chunk_size(self, size_bytes):
+        self._BUFFER_SIZE = int(size_bytes)
+        self._buffer = create_string_buffer(self._BUFFER_SIZE)
+
     # Reset oscilloscope to default values
     def reset(self):
-        self.write("*RST")
+        self._write_bytes(_CMD_RESET)
+        self._wav_format = None
+        self._clear_caches()
 
     # Allow manual operation in the oscilloscope (it's disabled when any remote command is executed)
+    # The cached setup and references are cleared, since they can be changed now from the front panel
     def unlock_screen(self):
         self.write(":KEY:LOCK DISABLE")
+        self._clear_caches()
 
     # Set channels to display
     def set_display_channels(self, channel_1=True, channel_2=False):
-        self.write(":CHAN1:DISP %s" % ("ON" if channel_1 else "OFF"))
-        self.write(":CHAN2:DISP %s" % ("ON" if channel_2 else "OFF"))
+        self.write_batch(self._display_channels_commands(channel_1, channel_2))
+        self._last_setup = None
 
     # Same as "Run" button (or "Single" if single=True)
     def run(self, single=False):
-        self.write(":SINGLE" if single else ":RUN")
+        self._write_bytes(_CMD_SINGLE if single else _CMD_RUN)
 
     # Same as "Stop" button
     def stop(self):
-        self.write(":STOP")
+        self._write_bytes(_CMD_STOP)
 
     # Force capture instead of waiting for trigger (similar to "Auto" trigger)
     def force_trigger(self):
-        self.write(":FORCETRIG")
+        self._write_bytes(_CMD_FORCE_TRIGGER)
 
     # Set triggering options, channels, scales, and wait for the captured data.
     # Params:
@@ -113,37 +172,57 @@ class AgilentOscilloscopeDSO1002A:
     #     time_scale: Time scale Numeric value in Seconds
     #     channel_1_y_scale: Vertical scale for channel 1. If 0, the channel will be disabled.
     #     channel_2_y_scale: Vertical scale for channel 2. If 0, the channel will be disabled.
+    #     samples_format: "WORD" (2 bytes per sample) or "BYTE" (1 byte per sample, half the data transferred)
+    # Returns time_s, ch1_v, ch2_v as numpy arrays (None for disabled channels)
+    # NOTE: The setup is skipped if it is the same of the previous call. If the configuration was changed with
+    #       write(), call reset() or any of the set_* methods before, so that it is applied again.
     def get_single_shoot(self, trigger_channel=0, trigger_level=0, trigger_slope_down=False, time_scale=1e-3,
-                         channel_1_y_scale=1, channel_2_y_scale=0):
-        self.stop()
-        # Channels to display
-        self.set_display_channels(channel_1=(not self.is_null(channel_1_y_scale)),
-                              channel_2=(not self.is_null(channel_2_y_scale)))
-        # Set scales
-        self.set_vertical_scales(channel_1_y_scale, channel_2_y_scale)
-        self.set_time_scale(time_scale)
-        # Configure buffer format
-        self.write(":WAV:FORMAT BYTE")  # 8 bits samples (WORD is not working currently)
-        self.write(":WAV:POINTS:MODE NORMAL")  # Screen data (more predictable behavior)
-        self.write(":WAV:POINTS 600")  # Max value for NORMAL mode
+                         channel_1_y_scale=1, channel_2_y_scale=0, samples_format="WORD"):
+        if samples_format not in ("BYTE", "WORD"):
+            raise RuntimeError("Format not supported for oscilloscope values: %s" % samples_format)
+        setup = (channel_1_y_scale, channel_2_y_scale, self.time_string_to_value(time_scale), samples_format)
+        if setup != self._last_setup:
+            self._apply_single_shoot_setup(channel_1_y_scale, channel_2_y_scale, time_scale, samples_format)
+            self._last_setup = setup
         # Configure and wait for trigger
         self.wait_one_trigger_event(trigger_channel, trigger_level, trigger_slope_down)
         # Retrieve data and calculate values
         time_s, ch1_v, ch2_v = None, None, None
         if not self.is_null(channel_1_y_scale):
             raw_buffer = self.get_raw_buffer(channel=1)
-            time_s, ch1_v = self.samples_values_from_buffer(raw_buffer)
+            time_s, ch1_v = self.samples_values_from_buffer(raw_buffer, channel=1)
         if not self.is_null(channel_2_y_scale):
             raw_buffer = self.get_raw_buffer(channel=2)
-            time_s, ch2_v = self.samples_values_from_buffer(raw_buffer)
+            time_s, ch2_v = self.samples_values_from_buffer(raw_buffer, channel=2)
         return time_s, ch1_v, ch2_v
 
+    # Stop and send the get_single_shoot() setup (channels, scales and waveform format) in a single message
+    def _apply_single_shoot_setup(self, channel_1_y_scale, channel_2_y_scale, time_scale, samples_format):
+        commands = [":STOP"]
+        # Channels to display
+        commands += self._display_channels_commands(channel_1=(not self.is_null(channel_1_y_scale)),
+                                                    channel_2=(not self.is_null(channel_2_y_scale)))
+        # Set scales
+        commands += self._vertical_scales_commands(channel_1_y_scale, channel_2_y_scale)
+        commands.append(self._time_scale_command(time_scale))
+        # Configure buffer format
+        commands.append(":WAV:FORMAT %s" % samples_format)  # 16 bits samples (Big Endian) or 8 bits samples
+        commands.append(":WAV:POINTS:MODE NORMAL")  # Screen data (more predictable behavior)
+        commands.append(":WAV:POINTS 600")  # Max value for NORMAL mode
+        # Block until the setup is applied, before arming the trigger (*OPC? returns "1")
+        commands.append("*OPC?")
+        self.write_batch(commands)
+        self.read()
+        self._wav_format = samples_format
+        self._clear_caches()
+
     # Set triggering options, wait for one event and Stop
     # Params:
     #     trigger_channel: 1, 2 or 0 (force immediate trigger, the other triggering options will be ignored)
     #     trigger_level: Numeric value in Volts
     #     trigger_slope_down: If True, wait for a negative slope to trigger. Otherwise wait for positive slope
-    def wait_one_trigger_event(self, trigger_channel=0, trigger_level=0, trigger_slope_down=False):
+    #     timeout: Maximum time to wait for the trigger event, in seconds
+    def wait_one_trigger_event(self, trigger_channel=0, trigger_level=0, trigger_slope_down=False, timeout=127):
         # Configure trigger
         # Trigger mode AUTO
         if self.is_null(trigger_channel):
@@ -155,78 +234,122 @@ class AgilentOscilloscopeDSO1002A:
             self.set_trigger(trigger_channel, trigger_level_divisions, trigger_slope_down)
             self.run(single=True)
         # Wait for trigger
-        n_try = 0
+        # Poll fast at first (10 ms, 16 ms, 26 ms...), then every 0.5 seconds at most
+        delay = 0.01
+        deadline = time.time() + timeout
         while True:
-            time.sleep(2**n_try)  # Wait 2^n_try seconds to check trigger status (limit is 2^6)
-            n_try += 1
-            self.write(":TRIGGER:STATUS?")
-            if self.read().find("STOP") >= 0:  # read() may return "STOP\n"
+            time.sleep(delay)
+            delay = min(0.5, delay * 1.6)
+            self._write_bytes(_CMD_TRIGGER_STATUS)
+            if self.read().strip() == b"STOP":  # Reply is "STOP\n" (or RUN, WAIT, AUTO, T'D)
                 break
-            elif n_try == 6:
-                raise RuntimeError("Trigger timeout. Waited for 127 seconds without triggering.")
+            elif time.time() > deadline:
+                raise RuntimeError("Trigger timeout. Waited for %d seconds without triggering." % timeout)
 
     # Retrieve raw samples buffer from oscilloscope (will block and throw exception if no data available)
     # NOTES: - Oscilloscope must have been triggered previously.
     #        - Will NOT set or change WAV configuration (format and number of points).
+    #        - read() blocks until the data block is received, or the VISA timeout (VI_ATTR_TMO_VALUE) expires.
     def get_raw_buffer(self, channel=1):
         # Retrieve data (raw buffer)
-        self.write(":WAV:SOURCE CHANNEL%d" % channel)
-        self.write(":WAV:DATA?")
-        time.sleep(1)
+        self.write_batch([":WAV:SOURCE CHANNEL%d" % channel, ":WAV:DATA?"])
         raw_data = self.read()
         if len(raw_data) == 11:  # This is an error for sure (header size). Warning: other errors may not be this size.
             raise RuntimeError("Could not retrieve data from oscilloscope. Check that all values are in range.")
         return raw_data
 
-    # Parse raw buffer and return samples values in seconds and volts
+    # Parse raw buffer and return samples values in seconds and volts (numpy arrays of float64 and float32)
     # NOTE: Oscilloscope configuration must not have changed since get_raw_buffer()
     # STEPS: -> Detect sample format (single byte or word, ASCII not supported yet)
     #        -> Parse buffer values
     #        -> Retrieve Scales and References
     #        -> Calculate values in seconds and volts
-    def samples_values_from_buffer(self, raw_buffer):
-        # Detect format (single byte or two bytes per sample. See ":WAVeform:FORMat" in Programmer's Reference)
-        self.write(":WAV:FORMAT?")
-        samples_format = self.read()
-        word_samples = samples_format.find("WORD") >= 0
-        byte_samples = samples_format.find("BYTE") >= 0
-        if (not word_samples) and (not byte_samples):  # ASCII format not supported yet
-            raise RuntimeError("Format not supported for oscilloscope values: %s" % samples_format)
+    # If word is None, the format set by set_waveform_format() is used (queried to the device only if unknown)
+    # If channel is given, the axis references are cached for that channel (see get_current_axis_reference())
+    def samples_values_from_buffer(self, raw_buffer, word=None, channel=None):
+        if word is None:
+            word = self.get_waveform_format() == "WORD"
 
         # Parse buffer to an array of samples
-        points = self._parse_samples_from_buffer(raw_buffer, word=word_samples)
+        points = self._parse_samples_from_buffer(raw_buffer, word=word)
 
         # Retrieve references from oscilloscope (must not have changed)
-        xorigin, xincrement, yorigin, yincrement, yreference = self.get_current_axis_reference()
+        xorigin, xincrement, yorigin, yincrement, yreference = self.get_current_axis_reference(channel)
 
-        # Calculate X and Y values (in Seconds and Volts)
+        # Calculate X and Y values (in Seconds and Volts), in place
         # See ":WAVeform:DATA" in Programmer's Reference
-        t_seconds = []
-        y_volts = []
-        for index in range(0, len(points)):
-            t_seconds.append(xorigin + (index * xincrement))
-            y_volts.append((yreference - points[index]) * yincrement -yorigin)
+        t_seconds, y_volts = self._get_samples_buffers(channel, points.size)
+        np.multiply(self._get_sample_indexes(points.size), xincrement, out=t_seconds)
+        t_seconds += xorigin
+        np.subtract(yreference, points, out=y_volts)
+        y_volts *= yincrement
+        y_volts -= yorigin
         return t_seconds, y_volts
 
+    # Return arrays for n_samples of time (float64) and voltage (float32)
+    # If reuse_buffers is True, the arrays are allocated once per channel (and again only if n_samples changes)
+    def _get_samples_buffers(self, channel, n_samples):
+        if not self.reuse_buffers:
+            return np.empty(n_samples, dtype=np.float64), np.empty(n_samples, dtype=np.float32)
+        buffers = self._samples_buffers.get(channel)
+        if buffers is None or buffers[0].size != n_samples:
+            buffers = (np.empty(n_samples, dtype=np.float64), np.empty(n_samples, dtype=np.float32))
+            self._samples_buffers[channel] = buffers
+        return buffers
+
+    # Return the array [0, 1, ..., n_samples-1] (cached, must not be modified)
+    def _get_sample_indexes(self, n_samples):
+        if self._sample_indexes.size != n_samples:
+            self._sample_indexes = np.arange(n_samples, dtype=np.float64)
+        return self._sample_indexes
+
     # Retrieve current channel increments and references, to calculate values in Volts/Seconds
     # See ":WAVeform:DATA" in Programmer's Reference
-    def get_current_axis_reference(self):
-        self.write(":WAV:XORIGIN?")
-        xorigin = float(self.read())
-        self.write(":WAV:XINCREMENT?")
-        xincrement = float(self.read())
-        self.write(":WAV:YREFERENCE?")
-        yreference = float(self.read())
-        self.write(":WAV:YINCREMENT?")
-        yincrement = float(self.read())
-        self.write(":WAV:YORIGIN?")
-        yorigin = float(self.read())
+    # All values are requested in a single chained query (one round-trip), responses are separated by ";"
+    # If channel is given (must be the current ":WAV:SOURCE"), the values are cached until the configuration changes
+    def get_current_axis_reference(self, channel=None):
+        if channel in self._axis_reference_cache:
+            return self._axis_reference_cache[channel]
+        self.write(":WAV:XORIGIN?;:WAV:XINCREMENT?;:WAV:YORIGIN?;:WAV:YINCREMENT?;:WAV:YREFERENCE?")
+        response = self.read().split(b";")
+        if len(response) != 5:
+            raise RuntimeError("Unexpected response for axis references: %s" % response)
+        xorigin, xincrement, yorigin, yincrement, yreference = [float(value) for value in response]
+        if channel is not None:
+            self._axis_reference_cache[channel] = (xorigin, xincrement, yorigin, yincrement, yreference)
         return xorigin, xincrement, yorigin, yincrement, yreference
 
+    # Set format of the samples returned by ":WAV:DATA?" (BYTE or WORD, ASCII not supported yet)
+    def set_waveform_format(self, samples_format):
+        if samples_format not in ("BYTE", "WORD"):
+            raise RuntimeError("Format not supported for oscilloscope values: %s" % samples_format)
+        self.write(":WAV:FORMAT %s" % samples_format)
+        self._wav_format = samples_format
+        self._axis_reference_cache.clear()
+        self._last_setup = None
+
+    # Return the current samples format ("BYTE" or "WORD"). The device is queried only if not set previously.
+    # See ":WAVeform:FORMat" in Programmer's Reference
+    def get_waveform_format(self):
+        if self._wav_format is None:
+            self.write(":WAV:FORMAT?")
+            samples_format = self.read()
+            if samples_format.find(b"WORD") >= 0:
+                self._wav_format = "WORD"
+            elif samples_format.find(b"BYTE") >= 0:
+                self._wav_format = "BYTE"
+            else:  # ASCII format not supported yet
+                raise RuntimeError("Format not supported for oscilloscope values: %s" % samples_format)
+        return self._wav_format
+
     # Convert a Voltage value to divisions, according to the current vertical scale for the given channel
+    # The scale is queried only once, until it is changed (see _clear_caches())
     def voltage_to_divisions(self, channel, voltage):
-        self.write(":CHAN%d:SCAL?" % channel)
-        scale = float(self.read())
+        scale = self._scale_cache.get(channel)
+        if scale is None:
+            self.write(":CHAN%d:SCAL?" % channel)
+            scale = float(self.read())
+            self._scale_cache[channel] = scale
         return float(voltage) / scale
 
     # Set time units per division
@@ -234,7 +357,9 @@ class AgilentOscilloscopeDSO1002A:
     # Valid examples: "32.0ns", "32 ms"
     # Invalid examples: "32.0s"
     def set_time_scale(self, timescale):
-        self.write(":TIMEBASE:SCALE %E" % self.time_string_to_value(timescale))
+        self.write(self._time_scale_command(timescale))
+        self._axis_reference_cache.clear()
+        self._last_setup = None
 
     # Set triggering options. Level value is given in divisions (remains with vertical scale changes)
     # Params:
@@ -242,26 +367,54 @@ class AgilentOscilloscopeDSO1002A:
     #     level_divisions: Numeric value in Divisions.
     #     slope_down: If True, wait for a negative slope to trigger. Otherwise wait for positive slope.
     def set_trigger(self, channel=1, level_divisions=0.0, slope_down=False):
-        self.write(":TRIG:EDGE:SOURCE %d" % channel)
-        self.write(":TRIG:EDGE:LEV %E" % level_divisions)
-        self.write(":TRIG:EDGE:SLOPE %s" % ("NEG" if slope_down else "POS"))
+        self.write(":TRIG:EDGE:SOURCE %d;:TRIG:EDGE:LEV %E;:TRIG:EDGE:SLOPE %s"
+                   % (channel, level_divisions, "NEG" if slope_down else "POS"))
 
+    # Set vertical scales (Volts/division). Channels with null scale are not modified.
     def set_vertical_scales(self, channel_1=1, channel_2=0):
-        if not self.is_null(channel_1):
-            self.write(":CHAN1:UNIT VOLT")
-            self.write(":CHAN1:SCALE %E" % channel_1)
-        if not self.is_null(channel_2):
-            self.write(":CHAN2:UNIT VOLT")
-            self.write(":CHAN2:SCALE %E" % channel_2)
+        commands = self._vertical_scales_commands(channel_1, channel_2)
+        if commands:
+            self.write_batch(commands)
+            # The oscilloscope may round the scales, they will be queried again when needed
+            self._clear_caches()
 
     # Set the attenuation of the probes
     # Valid examples: 10, 1000.0, 0.001, "1000.0", "1000X", "0.001X"
     # Invalid examples: "10.0X", "10x" (wrong format), 0.0001, 10000 (out of range)
     def set_probes(self, channel_1=10, channel_2=None):
+        commands = []
         if not self.is_null(channel_1):
-            self.write(":CHAN1:PROB %s" % self.attenuation_value_to_string(channel_1))
+            commands.append(":CHAN1:PROB %s" % self.attenuation_value_to_string(channel_1))
         if not self.is_null(channel_2):
-            self.write(":CHAN2:PROB %s" % self.attenuation_value_to_string(channel_2))
+            commands.append(":CHAN2:PROB %s" % self.attenuation_value_to_string(channel_2))
+        if commands:
+            self.write_batch(commands)
+        self._clear_caches()  # Vertical scales change with the probe attenuation
+
+    # Commands used by set_display_channels() (also by get_single_shoot(), to send them in a single message)
+    @staticmethod
+    def _display_channels_commands(channel_1, channel_2):
+        return [":CHAN1:DISP %s" % ("ON" if channel_1 else "OFF"),
+                ":CHAN2:DISP %s" % ("ON" if channel_2 else "OFF")]
+
+    # Commands used by set_vertical_scales()
+    def _vertical_scales_commands(self, channel_1, channel_2):
+        commands = []
+        if not self.is_null(channel_1):
+            commands += [":CHAN1:UNIT VOLT", ":CHAN1:SCALE %E" % channel_1]
+        if not self.is_null(channel_2):
+            commands += [":CHAN2:UNIT VOLT", ":CHAN2:SCALE %E" % channel_2]
+        return commands
+
+    # Command used by set_time_scale()
+    def _time_scale_command(self, timescale):
+        return ":TIMEBASE:SCALE %E" % self.time_string_to_value(timescale)
+
+    # Forget the scales and axis references queried previously (must be called when the configuration changes)
+    def _clear_caches(self):
+        self._axis_reference_cache.clear()
+        self._scale_cache.clear()
+        self._last_setup = None
 
     @staticmethod
     # Check if the parameter shall be considered null
@@ -282,18 +435,11 @@ class AgilentOscilloscopeDSO1002A:
     def freq_string_to_value(frequency):
         if isinstance(frequency, str):
             frequency = frequency.strip().lower()  # remove spaces (beginning and ending) and convert to lower case
-            unit = frequency[-3:len(frequency)]  # Extract unit in lower case
-            if unit == "ghz":
-                multiplier = 1e9
-                frequency = frequency[0:-3]
-            elif unit == "mhz":
-                multiplier = 1e6
-                frequency = frequency[0:-3]
-            elif unit == "khz":
-                multiplier = 1e3
-                frequency = frequency[0:-3]
-            else:
+            multiplier = _FREQUENCY_UNITS.get(frequency[-3:])  # Unit in lower case
+            if multiplier is None:
                 multiplier = 1
+            else:
+                frequency = frequency[0:-3]
             try:
                 frequency = float(frequency)*multiplier
             except:
@@ -309,18 +455,11 @@ class AgilentOscilloscopeDSO1002A:
     def time_string_to_value(time):
         if isinstance(time, str):
             time = time.strip().lower()
-            unit = time[-2:len(time)]
-            if unit == "ns":
-                multiplier = 1e-9
-                time = time[0:-2]
-            elif unit == "us":
-                multiplier = 1e-6
-                time = time[0:-2]
-            elif unit == "ms":
-                multiplier = 1e-3
-                time = time[0:-2]
-            else:
+            multiplier = _TIME_UNITS.get(time[-2:])
+            if multiplier is None:
                 multiplier = 1
+            else:
+                time = time[0:-2]
             try:
                 time = float(time)*multiplier
             except:
@@ -333,32 +472,34 @@ class AgilentOscilloscopeDSO1002A:
     # Valid examples: 10, 1000.0, 0.001, "1000.0", "1000X", "0.001X"
     # Invalid examples: "10.0X", "10x" (wrong format), 0.0001, 10000 (out of range)
     def attenuation_value_to_string(attenuation):
-        _probes_attenuation = {0.001:"0.001X", 0.01:"0.01X", 0.1:"0.1X", 1:"1X", 10:"10X", 100:"100X", 1000:"1000X"}
         if isinstance(attenuation, str):
             if attenuation[-1] != 'X':
                 attenuation = float(attenuation)
         if not isinstance(attenuation, str):
-            attenuation = _probes_attenuation[attenuation]
+            attenuation = _PROBES_ATTENUATION[attenuation]
         return attenuation
 
     # Extract an array with values from the buffer in the format defined in:
     #    Keysight 1000 Series Oscilloscope Programmer's Guide / Definite-Length Block Response Data
     # If word=True, each sample is two bytes in Big Endian
+    # Returns a numpy array (uint8 or uint16) which shares memory with buf (read-only)
     def _parse_samples_from_buffer(self, buf, word=True):
-        if buf[0] != '#':
+        # Header: "#", one digit with the number of length digits, and the length digits (e.g: "#9000001200")
+        # Slices are used instead of indexes, since indexing bytes returns integers in Python 3
+        if buf[0:1] != b"#" or not buf[1:2].isdigit():
             raise RuntimeError("Buffer is not in the format defined in Keysight 1000 Series Oscilloscope "
                                "Programmer's Guide / Definite-Length Block Response Data")
-        length_chars = int(buf[1])
+        length_chars = int(buf[1:2])
         length_buffer = int(buf[2:(2+length_chars)])
         total_length = 3 + length_chars + length_buffer
         if total_length > self._BUFFER_SIZE:
-            raise RuntimeError("Not enough buffer size (%d bytes) to hold %d bytes" % self._BUFFER_SIZE, total_length)
+            raise RuntimeError("Not enough buffer size (%d bytes) to hold %d bytes" % (self._BUFFER_SIZE, total_length))
         if total_length != len(buf):
-            raise RuntimeError("Expected buffer length: %d, got: %d" % (2 + length_chars + length_buffer, len(buf)))
+            raise RuntimeError("Expected buffer length: %d, got: %d" % (total_length, len(buf)))
         first_byte_pos = 2 + length_chars  # Character "#" and one integer indicating length characters
-        last_byte_pos = first_byte_pos + length_buffer - 1  # Remove \n at the end
+        # The \n at the end is not included in length_buffer
         if word:
             # 2 bytes per sample Big Endian (see :WAVeform:FORMat in Programmer's Guide).
-            return [((ord(buf[pos]) << 8) + ord(buf[pos+1])) for pos in range(first_byte_pos, last_byte_pos, 2)]
+            return np.frombuffer(buf, dtype='>u2', count=length_buffer // 2, offset=first_byte_pos)
         else:
-            return [ord(buf[pos]) for pos in range(first_byte_pos, last_byte_pos)]
+            return np.frombuffer(buf, dtype=np.uint8, count=length_buffer, offset=first_byte_pos)
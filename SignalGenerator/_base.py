@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Communication shared by the signal generators (see AgilentGenerator and AgilentRFGenerator): device discovery,
+write / read of SCPI commands through the VISA library, and frequency values conversions.
+
+This package requires the Visa folder and NIVISA DLL libraries installed.
+"""
+
+from __future__ import print_function
+from contextlib import contextmanager
+from ctypes import *
+from Visa.lib.constants import VI_SUCCESS_MAX_CNT
+
+__author__ = "Braulio Ríos"
+
+
+# Fixed commands (already encoded and terminated with line break)
+_CMD_RESET = b"*RST\n"
+_CMD_OPERATION_COMPLETE_QUERY = b"*OPC?\n"
+
+# Multipliers of the units accepted by freq_string_to_value() (lower case)
+_FREQUENCY_UNITS = {"ghz": 1e9, "mhz": 1e6, "khz": 1e3}
+
+
+# Generic VISA device controlled by SCPI commands
+class VisaScpiDevice:
+    # Public members
+    debug = True  # Print all write / read operations
+
+    # Private members
+    _device = None
+    # VISA DLL functions (signatures already applied by VisaLibrary), bound on initialization to skip the lookups
+    _viWrite = None
+    _viRead = None
+    _viClose = None
+    _BUFFER_SIZE = 64 * 1024  # Bytes read in each viRead (longer responses are read in several chunks)
+    _buffer = None  # Read buffer, created on initialization (one per device)
+    _ret_count = None  # Bytes count of the last viWrite / viRead, created on initialization
+    _ret_code = 0  # Return code of the last viRead
+    _batch = None  # Commands queued by write() while a batch() is active
+
+    def __init__(self, resource_string="*"):
+        self._buffer = create_string_buffer(self._BUFFER_SIZE)
+        self._ret_count = c_uint32()
+        # Imported here (not on module import) so that the VISA DLL is loaded only when a device is used
+        from Visa import VisaLibrary
+        visa = VisaLibrary.load()
+        self._viWrite = visa.viWrite
+        self._viRead = visa.viRead
+        self._viClose = visa.viClose
+        # Find a device connected containing the "INSTR" string
+        if resource_string == "*":
+            connected_devices = VisaLibrary.list_devices()
+            for device in connected_devices:
+                if device.find(b"INSTR") >= 0:
+                    if resource_string != "*":
+                        raise RuntimeError("More than one connected device found. Resource string must be provided.")
+                    resource_string = device
+                    break
+        # If still no device found, fail
+        if resource_string == "*":
+            raise RuntimeError("No device found. Check that device is connected using VISA Interactive Control")
+        self._device = VisaLibrary.open_device(resource_string)
+
+    # Send a generic command (see the device User's Guide). The commands built by the subclasses are already bytes.
+    def write(self, command):
+        # Convert command from str to bytes array (only necessary in Python 3)
+        if isinstance(command, str):
+            command = command.encode()
+        # Sent later, with the rest of the batch
+        if self._batch is not None:
+            self._queue_in_batch(command)
+            return
+        self._write_message(command)
+
+    # Write command (bytes), appending the final line break if not present.
+    # The debug message shows printable_command instead of the command if given (e.g: binary data summarized).
+    def _write_message(self, command, printable_command=None):
+        # Append final line break if not present
+        if not command.endswith(b"\n"):
+            command += b"\n"
+        command_length = len(command)
+        # Write
+        if 0 != self._viWrite(self._device, command, command_length, byref(self._ret_count)):
+            raise RuntimeError("Could not write data to device")
+        # Check length
+        if self._ret_count.value != command_length:
+            raise RuntimeError("Length written is different from expected. Command length: %d bytes / %d bytes written"
+                               % (command_length, self._ret_count.value))
+        # Print command (once written, in a single print call)
+        if self.debug:
+            if printable_command is None:
+                printable_command = command[0:-1]  # Remove line break to print
+            print("Sending command: \"%s\"... OK." % printable_command.decode(errors="replace"))
+
+    # Send several commands (bytes) in a single message, separated by ";" (e.g: [b":FREQ 1000", b":VOLT:LOW 0"])
+    # NOTE: Use the leading ":" on each command, otherwise SCPI resolves it relative to the previous one
+    # If printable_commands is given (one for each command), it's printed instead of commands in debug mode.
+    def write_batch(self, commands, printable_commands=None):
+        command = b";".join(commands)
+        printable_command = None if printable_commands is None else b";".join(printable_commands)
+        # Sent later, with the rest of the batch
+        if self._batch is not None:
+            self._queue_in_batch(command, printable_command)
+            return
+        self._write_message(command, printable_command)
+
+    # Queue the commands of a "with device.batch():" block, and send them in a single message when the block ends.
+    # e.g:
+    # with device.batch():
+    #     device.set_amplitude(1)
+    #     device.set_frequency(4e6)
+    # Queries are not allowed inside the block (the commands are not sent yet). If an exception is raised inside the
+    # block, the queued commands are discarded.
+    @contextmanager
+    def batch(self):
+        if self._batch is not None:  # Nested: commands are sent by the outer block
+            yield self
+            return
+        self._batch = []
+        try:
+            yield self
+            queued = self._batch
+        finally:
+            self._batch = None
+        if queued:
+            self.write_batch([command for command, _ in queued], [printable for _, printable in queued])
+
+    # Add command (bytes) to the active batch, with the text printed for it in debug mode (the command itself if
+    # printable_command is not given). Commands are resolved from the root (leading ":"), except the common
+    # commands ("*RST"), because the device resolves each one relative to the previous command in the message.
+    def _queue_in_batch(self, command, printable_command=None):
+        command = self._batch_command(command)
+        printable_command = command if printable_command is None else self._batch_command(printable_command)
+        self._batch.append((command, printable_command))
+
+    @staticmethod
+    # Command without the final line break, and with the leading ":" (see _queue_in_batch())
+    def _batch_command(command):
+        if command.endswith(b"\n"):
+            command = command[0:-1]
+        if not command.startswith((b":", b"*")):
+            command = b":" + command
+        return command
+
+    # Read response as bytes
+    def read(self):
+        if self._batch is not None:
+            raise RuntimeError("Cannot read responses inside a batch (commands are sent when the batch ends)")
+        response = self._read_chunk()
+        # Buffer filled before the end of the message: keep reading the rest of the response
+        if self._ret_code == VI_SUCCESS_MAX_CNT:
+            response = bytearray(response)
+            while self._ret_code == VI_SUCCESS_MAX_CNT:
+                response += self._read_chunk()
+            response = bytes(response)
+        # Print response
+        if self.debug:
+            print("Response: %s " % response.decode(errors="replace"))
+        return response
+
+    # Read up to _BUFFER_SIZE bytes (the VISA return code is kept in _ret_code)
+    def _read_chunk(self):
+        self._ret_code = self._viRead(self._device, self._buffer, self._BUFFER_SIZE, byref(self._ret_count))
+        if self._ret_code < 0:
+            raise RuntimeError("Could not read data from device. Return code: %d" % self._ret_code)
+        # Copy only the bytes read (trimmed by count, not by the first null character)
+        return string_at(self._buffer, self._ret_count.value)
+
+    # Resets signal generator to default values
+    def reset(self):
+        self.write(_CMD_RESET)
+
+    # Block until the device has finished all pending operations (answers "1" to *OPC?)
+    # Raises RuntimeError if the device doesn't answer before the VISA timeout.
+    def wait_operation_complete(self):
+        self.write(_CMD_OPERATION_COMPLETE_QUERY)
+        response = self.read().strip()
+        if response != b"1":
+            raise RuntimeError("Unexpected response to *OPC?: %s" % response.decode(errors="replace"))
+
+    # Close device
+    def close(self):
+        return self._viClose(self._device)
+
+    @staticmethod
+    # Convert value (if numeric) to string value with unit, as bytes (strings are only encoded)
+    def freq_value_to_string(frequency):
+        if isinstance(frequency, str):
+            frequency = frequency.encode()
+        elif not isinstance(frequency, bytes):
+            frequency = b"%.4f kHz" % (frequency / 1e3)
+        return frequency
+
+    @staticmethod
+    # Convert frequency string with unit to numeric value.
+    # Valid units are kHz, MHz, GHz, or nothing (case insensitive, optional space, only "Hz" is not allowed).
+    # Valid examples: 32.0khz , 44 MHz, 44MHZ, 44mhz, 8ghz
+    def freq_string_to_value(frequency):
+        if isinstance(frequency, str):
+            frequency = frequency.strip().lower()  # remove spaces (beginning and ending) and convert to lower case
+            multiplier = _FREQUENCY_UNITS.get(frequency[-3:])  # Unit in lower case
+            if multiplier is None:
+                multiplier = 1
+            else:
+                frequency = frequency[0:-3]
+            try:
+                frequency = float(frequency) * multiplier
+            except:
+                raise RuntimeError("Invalid format for frequency. Valid examples: '3.002kHz', '3e3', '3MHZ', '2ghz'"
+                                   "/ Invalid examples: '1.0 Hz', '1Hz', '8M' ")
+        return frequency
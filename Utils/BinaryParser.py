@@ -1,5 +1,7 @@
-from collections import OrderedDict
-from .Tools import extract_value_from_hex, convert_endianess, hex_string_to_char_string
+import struct
+import sys
+import weakref
+from collections import OrderedDict, namedtuple
 
 __author__ = "Braulio Ríos"
 
@@ -10,6 +12,26 @@ TYPE_ARRAY = "ARRAY"
 TYPE_STRING = "STRING"
 TYPE_STRUCT = "STRUCT"
 
+# Type of the parsed structs: plain dict preserves insertion order (and it's faster) since Python 3.7
+_PARSED_STRUCT_TYPE = dict if sys.version_info >= (3, 7) else OrderedDict
+
+# Field kinds in compiled schemas (integers, cheaper to compare than the TYPE_* strings)
+_KIND_UNPACK = 0  # Numeric fields filling an 8, 16, 32 or 64 bits container (read with struct.unpack_from)
+_KIND_UINT = 1  # Other numeric fields (simple or packed)
+_KIND_ARRAY = 2
+_KIND_STRING = 3
+_KIND_STRUCT = 4
+_KINDS = {TYPE_ARRAY: _KIND_ARRAY, TYPE_STRING: _KIND_STRING, TYPE_STRUCT: _KIND_STRUCT}
+# Little-endian unsigned readers for _KIND_UNPACK fields, by length in bits
+_UNPACK_FROM = {TYPE_8_BITS: struct.Struct("<B").unpack_from,
+                TYPE_16_BITS: struct.Struct("<H").unpack_from,
+                TYPE_32_BITS: struct.Struct("<I").unpack_from,
+                64: struct.Struct("<Q").unpack_from}
+
+# Results cached per fields instance: id(fields) -> (weak reference to fields, field names, value)
+_check_struct_cache = {}  # Struct length in bits
+_compiled_schema_cache = {}  # List of FieldOp and struct length in bits
+
 
 # Recover C-like structure fields data from an hex string, little endian encoded
 # Supports bit-length fields contained in byte-length fields (e.g: two fields of 3 and 5 bits into an UINT8)
@@ -26,92 +48,236 @@ TYPE_STRUCT = "STRUCT"
 # String types (TYPE_STRING), are similar to TYPE_ARRAY, but the byte values are converted to char.
 # Struct types (TYPE_STRUCT), structs that are parsed recursively
 def parse_struct_from_hex(fields, hex_string):
-    fields_parsed = OrderedDict()  # Result will be stored here
-    container_fields_offset = 0
-    packed_field_offset = 0
-    first_packed_field = True
-    prev_field_length = 0
-    total_length_string = len(hex_string)
-
     # Check hex string is even
-    assert total_length_string % 2 == 0, "Invalid hex string (length is not even): %s" % hex_string
+    assert len(hex_string) % 2 == 0, "Invalid hex string (length is not even): %s" % hex_string
+    # The hex string is decoded only once, arrays are sliced from the original string
+    buffer = bytes.fromhex(hex_string)
+    return parse_compiled(_compile_for_buffer(fields, buffer), buffer, hex_string)
+
+
+# Same as parse_struct_from_hex(), but receives the raw bytes (bytes, bytearray) instead of an hex string.
+# Array types (TYPE_ARRAY) are returned as memoryview slices of buffer (not copied, use .tobytes() or .hex() to get
+# a copy), they are only valid while buffer is not modified.
+def parse_struct_from_bytes(fields, buffer):
+    return parse_compiled(_compile_for_buffer(fields, buffer), memoryview(buffer))
+
+
+# Compiled fields (see compile_schema), checking that struct length and buffer match
+def _compile_for_buffer(fields, buffer):
+    ops, struct_length = _get_compiled_schema(fields)
+    assert struct_length == len(buffer)*8,\
+        "buffer provided (%d bytes) does not match structure length (%d bytes)" % (len(buffer), struct_length >> 3)
+    return ops
 
-    # Check that struct length and hex string match (check_struct validate internal structure lengths)
-    struct_length = check_struct(fields)  # length in bits
-    assert struct_length == total_length_string*4,\
-        "hex string provided (%d bytes) does not match structure length (%d bytes)"\
-        % (total_length_string / 2, struct_length/8)
 
-    # Go over the hex string, converting from low-endian and extracting field values
-    # Some fields are byte-sized, and others are bit-sized packed into byte-sized containers
-    container_value = None
+# Compiled field: limits of its container in the buffer (bytes, absolute), position inside the container (bits),
+# parsing kind (_KIND_UNPACK, _KIND_UINT, _KIND_ARRAY, _KIND_STRING or _KIND_STRUCT), optional handler,
+# compiled sub struct, bit mask of the field (bit_length bits set) and struct reader (only _KIND_UNPACK).
+FieldOp = namedtuple("FieldOp", ["name", "byte_start", "byte_end", "bit_offset", "bit_length", "kind", "handler",
+                                 "sub_ops", "mask", "unpack_from"])
+
+
+# Convert the fields definition (see parse_struct_from_hex) to a list of FieldOp, to parse buffers with
+# parse_compiled() without checking the fields types and lengths again. The result is cached per fields instance.
+def compile_schema(fields):
+    return _get_compiled_schema(fields)[0]
+
+
+# Compiled fields and struct length in bits (both cached together, a single lookup per parse)
+def _get_compiled_schema(fields):
+    compiled = _get_cached(_compiled_schema_cache, fields)
+    if compiled is None:
+        struct_length = check_struct(fields)  # Validate lengths (sub structs are validated recursively)
+        compiled = (_compile_schema(fields, 0), struct_length)
+        _store_cached(_compiled_schema_cache, fields, compiled)
+    return compiled
+
+
+# Fields must be already validated by check_struct()
+def _compile_schema(fields, start_byte):
+    ops = []
+    container_fields_offset = 0  # bits
+    packed_field_offset = 0
+    container_start_byte = container_end_byte = start_byte
+    first_packed_field = True
     for field in fields:
         # --------------------- IDENTIFY FIELD TYPE ------------------------------
         # Packed fields are variable bit-length, in container fields of fixed bit-length (8, 16 or 32 bits)
         # The packed fields must be defined as tuples with the packed size and container size
         is_simple_field = isinstance(fields[field], int)
-        # Array types are preserved as hex strings
-        is_array = not is_simple_field and fields[field][1] == TYPE_ARRAY
-        # Similar to Array types but each byte is converted to char
-        is_string = not is_simple_field and fields[field][1] == TYPE_STRING
-        # Allows including structs inside structs, will be parsed recursively
-        is_struct = not is_simple_field and fields[field][1] == TYPE_STRUCT
+        kind = _KIND_UINT if is_simple_field else _KINDS.get(fields[field][1], _KIND_UINT)
 
         # --------------------- CALCULATE LENGTH ------------------------------
         # Simple fields are treated as packed fields, with the same length than the container
         if is_simple_field:
             container_field_length = fields[field]
             packed_field_length = container_field_length
-        elif is_array or is_string:
+        elif kind == _KIND_ARRAY or kind == _KIND_STRING:
             container_field_length = fields[field][0]
             packed_field_length = container_field_length
-        elif is_struct:
+        elif kind == _KIND_STRUCT:
             container_field_length = check_struct(fields[field][0])  # check_struct returns struct length in bits
             packed_field_length = container_field_length
         else:  # packed fields
             container_field_length = fields[field][1]
             packed_field_length = fields[field][0]
 
-        # --------------------- EXTRACT CONTAINER (only first packed field) ------------------------------
+        # --------------------- LOCATE CONTAINER (only first packed field) ------------------------------
         if first_packed_field:
             packed_field_offset = 0
-            # Container field limits in hex string
-            container_start_char = int(container_fields_offset/4)  # each hex character is 4 bits
-            container_end_char = int(container_start_char + container_field_length/4)
-            # Extract from string
-            container_value = hex_string[container_start_char:container_end_char]
+            # Container field limits in buffer
+            container_start_byte = start_byte + (container_fields_offset >> 3)
+            container_end_byte = container_start_byte + (container_field_length >> 3)
             container_fields_offset += container_field_length
 
-        # ---------------------------- EXTRACT AND PARSE FIELD ----------------------------------
-        if is_array:     # Preserve as hex string
-            fields_parsed[field] = container_value
-        elif is_string:  # Convert to char
-            fields_parsed[field] = hex_string_to_char_string(container_value)
-        elif is_struct:  # Parse recursively
-            fields_parsed[field] = parse_struct_from_hex(fields[field][0], container_value)
-        else:            # Numeric values: convert container to big-endian and to integer (or long)
-            if first_packed_field:
-                container_value = convert_endianess(container_value)
-            fields_parsed[field] = extract_value_from_hex(container_value, packed_field_offset, packed_field_length)
-
-        # Execute Handler for field if present (3rd tuple element)
+        # Handler for field if present (3rd tuple element)
+        handler = None
         if not is_simple_field and len(fields[field]) > 2 and hasattr(fields[field][2], '__call__'):
-            fields_parsed[field] = fields[field][2](fields_parsed[field])
+            handler = fields[field][2]
+        # Sub structs are compiled with absolute positions too
+        sub_ops = _compile_schema(fields[field][0], container_start_byte) if kind == _KIND_STRUCT else None
+        # Numeric fields using the whole container are read directly
+        unpack_from = None
+        if kind == _KIND_UINT and packed_field_length == container_field_length:
+            unpack_from = _UNPACK_FROM.get(container_field_length)
+            if unpack_from is not None:
+                kind = _KIND_UNPACK
+
+        ops.append(FieldOp(field, container_start_byte, container_end_byte, packed_field_offset, packed_field_length,
+                           kind, handler, sub_ops, (1 << packed_field_length) - 1, unpack_from))
 
         packed_field_offset += packed_field_length
 
         # Detect if the next is the first packed field
         first_packed_field = (packed_field_offset == container_field_length)
 
+    return ops
+
+
+# Parse buffer (bytes, bytearray, memoryview) using the fields compiled by compile_schema().
+# Buffer length is not checked here. Arrays are returned as slices of buffer (memoryview slices are not copied),
+# or as hex strings sliced from hex_string if given (the same data as buffer).
+def parse_compiled(ops, buffer, hex_string=None):
+    fields_parsed = _PARSED_STRUCT_TYPE()  # Result will be stored here (in fields order)
+    container_start_byte = -1
+    container_value = 0
+    # Unpacked in the loop (faster than namedtuple attributes access), most frequent kinds are checked first
+    for name, byte_start, byte_end, bit_offset, _, kind, handler, sub_ops, mask, unpack_from in ops:
+        if kind == _KIND_UNPACK:    # Numeric values filling the container: single little-endian read
+            value = unpack_from(buffer, byte_start)[0]
+        elif kind == _KIND_UINT:    # Numeric values: convert little-endian container to integer, then extract bits
+            # Packed fields share the container, converted only once
+            if byte_start != container_start_byte:
+                container_start_byte = byte_start
+                container_value = int.from_bytes(buffer[byte_start:byte_end], "little")
+            value = (container_value >> bit_offset) & mask
+        elif kind == _KIND_ARRAY:   # Preserve as hex string (or buffer slice)
+            if hex_string is None:
+                value = buffer[byte_start:byte_end]
+            else:
+                value = hex_string[2*byte_start:2*byte_end]
+        elif kind == _KIND_STRING:  # Convert to char (latin1 maps each byte to the char of the same code)
+            value = str(buffer[byte_start:byte_end], "latin1")
+        else:                       # _KIND_STRUCT
+            value = parse_compiled(sub_ops, buffer, hex_string)
+        if handler is not None:
+            value = handler(value)
+        fields_parsed[name] = value
     return fields_parsed
 
 
+# Parse a batch of buffers with the same struct (see parse_struct_from_bytes), returning one column per field:
+# numeric fields as numpy arrays (smallest unsigned dtype for the field length), arrays as 2D uint8 numpy arrays
+# (one row per buffer), strings as lists and sub structs as nested columns. Handlers are not applied.
+def parse_batch(fields, buffers):
+    # Imported here so that numpy is only required for batch parsing
+    import numpy as np
+    ops, struct_length = _get_compiled_schema(fields)
+    frame_length = struct_length >> 3
+    for buffer in buffers:
+        assert len(buffer) == frame_length,\
+            "buffer provided (%d bytes) does not match structure length (%d bytes)" % (len(buffer), frame_length)
+    # All the buffers in a single (buffers x bytes) matrix, fields are extracted as columns
+    frames = np.frombuffer(b"".join(buffers), dtype=np.uint8).reshape(len(buffers), frame_length)
+    return _parse_batch_columns(np, ops, frames)
+
+
+def _parse_batch_columns(np, ops, frames):
+    columns = _PARSED_STRUCT_TYPE()
+    container_start_byte = -1
+    container_values = None
+    for name, byte_start, byte_end, bit_offset, bit_length, kind, _, sub_ops, mask, _ in ops:
+        if kind == _KIND_UNPACK or kind == _KIND_UINT:
+            # Packed fields share the container, converted only once
+            if byte_start != container_start_byte:
+                container_start_byte = byte_start
+                container_values = _batch_container_values(np, frames[:, byte_start:byte_end])
+            if container_values.dtype == object:  # Containers longer than 64 bits (python integers)
+                values = (container_values >> bit_offset) & mask
+                columns[name] = values if bit_length > 64 else values.astype(_batch_dtype(np, bit_length))
+            else:
+                columns[name] = ((container_values >> np.uint64(bit_offset)) & np.uint64(mask))\
+                    .astype(_batch_dtype(np, bit_length))
+        elif kind == _KIND_ARRAY:
+            columns[name] = frames[:, byte_start:byte_end]
+        elif kind == _KIND_STRING:
+            columns[name] = [frame.tobytes().decode("latin1") for frame in frames[:, byte_start:byte_end]]
+        else:
+            columns[name] = _parse_batch_columns(np, sub_ops, frames)
+    return columns
+
+
+# Little-endian integer values of the container bytes (one row per buffer)
+def _batch_container_values(np, container_bytes):
+    n_bytes = container_bytes.shape[1]
+    if n_bytes > 8:
+        return np.array([int.from_bytes(row.tobytes(), "little") for row in container_bytes], dtype=object)
+    values = np.zeros(container_bytes.shape[0], dtype=np.uint64)
+    for byte_n in range(n_bytes):
+        values |= container_bytes[:, byte_n].astype(np.uint64) << np.uint64(8*byte_n)
+    return values
+
+
+def _batch_dtype(np, bit_length):
+    if bit_length <= 8:
+        return np.uint8
+    elif bit_length <= 16:
+        return np.uint16
+    elif bit_length <= 32:
+        return np.uint32
+    return np.uint64
+
+
 # Return structure length in bits.
 # Check that fields var is in a format supported by parse_struct_from_hex
 # Check that fields is OrderedDict, that each field is integer or 2-element list, containers multiple of 8 bits
 # and that bit-length fields match containers length
 # Struct fields are also checked recursively
+# The result is cached per fields instance, schemas must not change field types/lengths after the first parse
+# (only adding, removing or renaming fields is detected)
 def check_struct(fields):
+    struct_length = _get_cached(_check_struct_cache, fields)
+    if struct_length is None:
+        struct_length = _check_struct(fields)
+        _store_cached(_check_struct_cache, fields, struct_length)
+    return struct_length
+
+
+# Cached values per fields instance, only returned if the field names didn't change
+def _get_cached(cache, fields):
+    cached = cache.get(id(fields))
+    if cached is not None and cached[0]() is fields and cached[1] == tuple(fields):
+        return cached[2]
+    return None
+
+
+# Weak reference to the fields, so that cached schemas are released (and their id not mistaken with a new one)
+def _store_cached(cache, fields, value):
+    key = id(fields)
+    cache[key] = (weakref.ref(fields, lambda ref: cache.pop(key, None)), tuple(fields), value)
+
+
+def _check_struct(fields):
     total_length_sum_bits = 0
     packed_field_offset = 0
     prev_container_length = 0
@@ -159,153 +325,3 @@ def check_struct(fields):
         prev_container_length = current_container_length
 
     return total_length_sum_bits
-
-
-class BinaryParserTester:
-    def __init__(self):
-        pass
-
-    @staticmethod
-    def test_all():
-        BinaryParserTester.test_endian_converter()
-        BinaryParserTester.test_hex_extractor()
-        BinaryParserTester.test_hex_parser()
-
-    @staticmethod
-    def test_endian_converter():
-        print("Testing convert_little_endian_to_big_endian()...")
-        val = convert_endianess("0f512332")
-        assert val == "3223510f", "Wrong endian converted value, expected 3223510f, got %s" % val
-
-        val = convert_endianess("12345abcdeff")
-        assert val == "ffdebc5a3412", "Wrong endian converted value, expected ffdebc5a3412, got %s" % val
-
-        val = convert_endianess("f135")
-        assert val == "35f1", "Wrong endian converted value, expected 35f1, got %s" % val
-        print("OK")
-
-    @staticmethod
-    def test_hex_extractor():
-        print("Testing extract_value_from_hex()...")
-        val = extract_value_from_hex("0552", 7, 3)  # start bit 7, length 3: 010
-        assert val == 0x2, "Wrong extracted value, expected 0x2, got 0x%x" % val
-
-        val = extract_value_from_hex("9ff2", 8, 8)
-        assert val == 0x9f, "Wrong extracted value, expected 0x9f, got 0x%x" % val
-
-        val = extract_value_from_hex("0f521236", 12, 16)
-        assert val == 0xf521, "Wrong extracted value, expected 0xf521, got 0x%x" % val
-        print("OK")
-
-    @staticmethod
-    def test_hex_parser():
-        print("Testing parse_fields_from_hex()...")
-
-        hex_string = "8fe37156"
-        hex_string += "f87ae5" + "31206162632031"  # sub struct 1 (second part is "1 abc 1" converted to hex)
-        hex_string += "a87ae3" + "32206162632032"  # sub struct 2 (second part is "2 abc 2" converted to hex)
-        hex_string += "f87ae5" + "33206162632033"  # sub struct 3 (second part is "3 abc 3" converted to hex)
-        hex_string += "11ff"
-        hex_string += "55727567756179"  # "Uruguay" converted to hex
-
-        # Warning: must be constructed this way because OrderedDict(arg1 =..., arg2=...) doesn't preserve ORDER
-        sub_struct_format = OrderedDict()
-        sub_struct_format["sub_field_1"] = TYPE_8_BITS
-        sub_struct_format["sub_field_2"] = (7, TYPE_16_BITS)
-        sub_struct_format["sub_field_3"] = (9, TYPE_16_BITS)
-        sub_struct_format["sub_field_4"] = (7*TYPE_8_BITS, TYPE_STRING)
-
-        fields = OrderedDict()
-
-        fields["field1"] = TYPE_8_BITS
-        fields["field2"] = (5, TYPE_8_BITS, lambda x: "ONE" if x == 1 else "NOT ONE")
-        fields["field3"] = (3, TYPE_8_BITS)
-        fields["field4"] = (12, TYPE_16_BITS, lambda x: x+1)
-        fields["field5"] = (4, TYPE_16_BITS)
-        fields["sub_struct_0"] = (sub_struct_format, TYPE_STRUCT)
-        fields["sub_struct_1"] = (sub_struct_format, TYPE_STRUCT)
-        fields["sub_struct_2"] = (sub_struct_format, TYPE_STRUCT)
-        fields["field6"] = TYPE_16_BITS
-        fields["field7"] = (7*TYPE_8_BITS, TYPE_STRING)
-
-        structure = parse_struct_from_hex(fields, hex_string)
-
-        assert structure["field1"] == 0x8f, "field1 wrong, expected 0x8f, got: 0x%x" % structure["field1"]
-        assert structure["field2"] == "NOT ONE", "field2 wrong, expected string \"NOT ONE\", got: 0b%o" % structure["field2"]
-        assert structure["field3"] == 0b111, "field3 wrong, expected 0b111, got: %d" % structure["field3"]
-        assert structure["field4"] == 0x671 + 1, "field4 wrong, expected 0x672, got: 0x%x" % structure["field4"]
-        assert structure["field5"] == 0x5, "field5 wrong, expected 0x5, got: 0x%x" % structure["field5"]
-
-        # sub_struct_0
-        assert structure["sub_struct_0"]["sub_field_1"] == 0xf8,\
-            "sub_struct_0/sub_field_1 wrong, expected 0xf8, got 0x%x" % structure["sub_struct_0"]["sub_field_1"]
-        assert structure["sub_struct_0"]["sub_field_2"] == 0x7a,\
-            "sub_struct_0/sub_field_2 wrong, expected 0x7a, got 0x%x" % structure["sub_struct_0"]["sub_field_2"]
-        assert structure["sub_struct_0"]["sub_field_3"] == (2*0xe5),\
-            "sub_struct_0/sub_field_3 wrong, expected 2*0xe5, got 0x%x" % structure["sub_struct_0"]["sub_field_3"]
-        assert structure["sub_struct_0"]["sub_field_4"] == "1 abc 1",\
-            "sub_struct_0/sub_field_4 wrong, expected \'1 abc 1\', got \'%s\'"\
-            % structure["sub_struct_0"]["sub_field_4"]
-
-        # sub_struct_1
-        assert structure["sub_struct_1"]["sub_field_1"] == 0xa8,\
-            "sub_struct_1/sub_field_1 wrong, expected 0xa8, got 0x%x" % structure["sub_struct_1"]["sub_field_1"]
-        assert structure["sub_struct_1"]["sub_field_2"] == 0x7a,\
-            "sub_struct_1/sub_field_2 wrong, expected 0x7a, got 0x%x" % structure["sub_struct_1"]["sub_field_2"]
-        assert structure["sub_struct_1"]["sub_field_3"] == (2*0xe3),\
-            "sub_struct_1/sub_field_3 wrong, expected 2*0xe3, got 0x%x" % structure["sub_struct_1"]["sub_field_3"]
-        assert structure["sub_struct_1"]["sub_field_4"] == "2 abc 2",\
-            "sub_struct_1/sub_field_4 wrong, expected \'2 abc 2\', got \'%s\'"\
-            % structure["sub_struct_1"]["sub_field_4"]
-
-        # sub_struct_2
-        assert structure["sub_struct_2"]["sub_field_1"] == 0xf8,\
-            "sub_struct_1/sub_struct_2 wrong, expected 0xf8, got 0x%x" % structure["sub_struct_2"]["sub_field_1"]
-        assert structure["sub_struct_2"]["sub_field_2"] == 0x7a,\
-            "sub_struct_2/sub_field_2 wrong, expected 0x7a, got 0x%x" % structure["sub_struct_2"]["sub_field_2"]
-        assert structure["sub_struct_2"]["sub_field_3"] == (2*0xe5),\
-            "sub_struct_2/sub_field_3 wrong, expected 2*0xe5, got 0x%x" % structure["sub_struct_2"]["sub_field_3"]
-        assert structure["sub_struct_2"]["sub_field_4"] == "3 abc 3",\
-            "sub_struct_2/sub_field_4 wrong, expected \'3 abc 3\', got \'%s\'"\
-            % structure["sub_struct_2"]["sub_field_4"]
-
-        # Last 2 fields
-        assert structure["field6"] == 0xff11, "field6 wrong, expected 0xff11, got: 0x%x" % structure["field6"]
-        assert structure["field7"] == "Uruguay",\
-            "field7 wrong, expected \'Uruguay\', got: \'%s\'"\
-            % structure["field7"]
-
-        print(structure)
-
-
-
-        print("OK")
-
-
-# class BitArray:
-#     def __init__(self, hex_string):
-#         self.byte_array = [] # pre-allocation barely matters in python
-#         # go over the list in steps of 2 and take 2-characters as each byte
-#         for byte_number in range(0, len(hex_string), 2):
-#             byte_hex = hex_string[byte_number:(byte_number+2)]
-#             byte_value = int(byte_hex, 16)
-#             self.byte_array.append(byte_value)
-#
-#     def is_one(self, bit_position):
-#         (byte_pos, bit_pos) = divmod(bit_position, 8)
-#         return ((self.byte_array[byte_pos] & (0b10000000 >> bit_pos)) & 0xFF) != 0
-
-# def hex_to_binary_string(hex_string):
-#     binary_string = ""
-#     is_msb = True
-#     byte_value = 0
-#     for nibble in hex_string:
-#         nibble_value = int(nibble, 16)
-#         if is_msb:
-#             byte_value = 0x10*nibble_value
-#         else:
-#             byte_value += nibble_value
-#             binary_string += '{:0>8}'.format(bin(byte_value).replace('0b', ''))
-#         is_msb = not is_msb
-#     return binary_string
-
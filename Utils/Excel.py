@@ -6,15 +6,21 @@ __author__ = "Braulio Ríos"
 
 
 # Generate an excel file with one time column, and one (or two) data columns, and plot the result.
+# Vectors can be any iterable (lists, numpy arrays, generators...). Numpy arrays are converted to lists of floats
+# in a single call (instead of writing numpy scalars one by one), other iterables are written without copying them.
+# If n_data (number of samples) is given, lengths are not checked (e.g: necessary for generators).
 def plot_signals(file_name, x_vector, y_vector_1, y_legend_1, y_vector_2=None, y_legend_2=None, x_label='Time (s)',
-                 y_label='Voltage (V)', title="Signal Data"):
-    if len(x_vector) != len(y_vector_1):
-        raise RuntimeError("Unable to Plot. X and Y lengths are different (%d - %d)" % (len(x_vector), len(y_vector_1)))
-    if (y_vector_2 is not None) and (len(y_vector_2) != len(y_vector_1)):
-        raise RuntimeError("Unable to Plot the two given signals. "
-                           "Y1 and Y2 lengths are different (%d - %d)" % (len(x_vector), len(y_vector_1)))
-    # Excel file and worksheet
-    workbook = xlsxwriter.Workbook(file_name)
+                 y_label='Voltage (V)', title="Signal Data", n_data=None):
+    if n_data is None:
+        n_data = len(x_vector)
+        if n_data != len(y_vector_1):
+            raise RuntimeError("Unable to Plot. X and Y lengths are different (%d - %d)" % (n_data, len(y_vector_1)))
+        if (y_vector_2 is not None) and (len(y_vector_2) != n_data):
+            raise RuntimeError("Unable to Plot the two given signals. "
+                               "Y1 and Y2 lengths are different (%d - %d)" % (n_data, len(y_vector_2)))
+    # Excel file and worksheet (constant_memory: each row is flushed to a temp file once the next one is written)
+    workbook = xlsxwriter.Workbook(file_name, {'constant_memory': True,
+                                               'tmpdir': os.path.dirname(os.path.abspath(file_name))})
     worksheet = workbook.add_worksheet()
     bold = workbook.add_format({'bold': True})
     numeric = workbook.add_format({'num_format': '0.00'})
@@ -24,13 +30,13 @@ def plot_signals(file_name, x_vector, y_vector_1, y_legend_1, y_vector_2=None, y
     worksheet.write('B2', y_legend_1, bold)
     if y_vector_2 is not None:
         worksheet.write('C2', y_legend_2, bold)
-    # Add data columns
-    worksheet.write_column('A3', x_vector, numeric)
-    worksheet.write_column('B3', y_vector_1, numeric)
+    # Add data columns, row by row (required in constant_memory mode)
+    vectors = [_native_values(x_vector), _native_values(y_vector_1)]
     if y_vector_2 is not None:
-        worksheet.write_column('C3', y_vector_2, numeric)
+        vectors.append(_native_values(y_vector_2))
+    for row, values in enumerate(zip(*vectors), 2):
+        worksheet.write_row(row, 0, values, numeric)
     # Create Plot
-    n_data = len(x_vector)
     plot = workbook.add_chart({'type': 'line'})
     plot.add_series({
                     'name':       y_legend_1,
@@ -52,3 +58,8 @@ def plot_signals(file_name, x_vector, y_vector_1, y_legend_1, y_vector_2=None, y
     # Insert the chart into the worksheet (with an offset).
     worksheet.insert_chart('F3', plot)
     workbook.close()
+
+
+# Return numpy arrays as lists of Python numbers (converted in C, all at once), other iterables unchanged
+def _native_values(vector):
+    return vector.tolist() if hasattr(vector, "tolist") else vector
@@ -2,17 +2,22 @@ import sys
 
 __author__ = "Braulio Ríos"
 
+# Bit masks for the usual lengths: _MASKS[n] = n bits set
+_MASKS = [(1 << n) - 1 for n in range(65)]
+
+# Binary string of each byte value, MSB first: _BYTE_BITS[5] = "00000101"
+_BYTE_BITS = ['{:08b}'.format(byte_value) for byte_value in range(256)]
+
+
 # Converts a 2 bytes integer to 4 characters string, in little endian (as used in RDP words)
 def to_word_little_endian(number):
-    return '{0:02X}{1:02X}'.format(number & 0xFF, (number >> 8) & 0xFF)
+    return (number & 0xFFFF).to_bytes(2, "little").hex().upper()
 
 
 # Converts any integer to hexa string of 2*length_bytes characters, in little endian
+# Higher bytes not fitting in length_bytes are discarded (as well as the sign, negatives are two's complement)
 def to_string_little_endian(number, length_bytes):
-    hex_str = ""
-    for i in range(0, length_bytes):
-        hex_str += '{:02X}'.format((number >> 8*i) & 0xFF)
-    return hex_str
+    return (number & (2**(8*length_bytes) - 1)).to_bytes(length_bytes, "little").hex().upper()
 
 
 # Extract a byte value from an hex string at given position (starts in 0)
@@ -20,33 +25,32 @@ def get_byte_from_hex(position, hex_string):
     return int(hex_string[2*position:2*(position + 1)], 16)
 
 
+# Convert each byte of an hex string to the char of the same code (e.g: "4142" -> "AB")
 def hex_string_to_char_string(hex_string):
-    string = ""
-    for byte_n in range(0, int(len(hex_string)/2)):
-        string += chr(get_byte_from_hex(byte_n, hex_string))
-    return string
+    return bytes.fromhex(hex_string).decode("latin1")
 
 
 # Extract selected bits (LSB ->bit 0) from hex string and convert to integer (cannot be used if string is little-endian)
+# The value can also be given as integer (already converted from hex)
 def extract_value_from_hex(hex_string, start_bit, length_bits):
-    result = int(hex_string, 16)
+    result = int(hex_string, 16) if isinstance(hex_string, str) else hex_string
     result >>= start_bit
-    result &= 2**length_bits - 1  # Mask
+    result &= _MASKS[length_bits] if length_bits < len(_MASKS) else (1 << length_bits) - 1
     return result
 
 
+# Convert hex string to binary string, MSB first (e.g: "0a" -> "00001010")
+def hex_to_binary_string(hex_string):
+    return "".join([_BYTE_BITS[byte_value] for byte_value in bytes.fromhex(hex_string)])
+
+
 # Swap byte orders in an hex string, to switch from little-endian to big-endian or vice-versa
+# Characters are kept as they are (e.g: "0F5a" -> "5a0F"). The length must be even (complete bytes).
 def convert_endianess(hex_string):
-    result = ""
     length = len(hex_string)
-    for i in range(0, length, 2):
-        result += hex_string[(length-i-2):(length-i)]
-    return result
+    # Pairs of characters from the last one to the first one, joined once
+    return "".join([hex_string[(length-i-2):(length-i)] for i in range(0, length, 2)])
 
 
-# Avoid using input() and raw_input() for compatibility between python 2 and 3
-def wait_input(message):
-    if sys.version_info >= (3, 0):
-        return input(message)
-    else:
-        return raw_input(message)
\ No newline at end of file
+# Avoid using input() and raw_input() for compatibility between python 2 and 3 (selected once, on import)
+wait_input = input if sys.version_info >= (3, 0) else raw_input
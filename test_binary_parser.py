@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+import random
+from collections import OrderedDict
+from Utils.BinaryParser import parse_struct_from_hex, parse_struct_from_bytes, parse_batch, TYPE_8_BITS, TYPE_16_BITS,\
+    TYPE_32_BITS, TYPE_ARRAY, TYPE_STRING, TYPE_STRUCT
+from Utils.Tools import extract_value_from_hex, convert_endianess
+
+
+class BinaryParserTester:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def test_all():
+        BinaryParserTester.test_endian_converter()
+        BinaryParserTester.test_hex_extractor()
+        BinaryParserTester.test_hex_parser()
+        BinaryParserTester.test_bytes_parser()
+        BinaryParserTester.test_parse_batch()
+
+    @staticmethod
+    def test_endian_converter():
+        print("Testing convert_little_endian_to_big_endian()...")
+        val = convert_endianess("0f512332")
+        assert val == "3223510f", "Wrong endian converted value, expected 3223510f, got %s" % val
+
+        val = convert_endianess("12345abcdeff")
+        assert val == "ffdebc5a3412", "Wrong endian converted value, expected ffdebc5a3412, got %s" % val
+
+        val = convert_endianess("f135")
+        assert val == "35f1", "Wrong endian converted value, expected 35f1, got %s" % val
+
+        val = convert_endianess("0F512A3b")  # case is preserved
+        assert val == "3b2A510F", "Wrong endian converted value, expected 3b2A510F, got %s" % val
+
+        val = convert_endianess("12345")  # odd length: same output as the original character slicing
+        assert val == "4523", "Wrong endian converted value, expected 4523, got %s" % val
+        print("OK")
+
+    @staticmethod
+    def test_hex_extractor():
+        print("Testing extract_value_from_hex()...")
+        val = extract_value_from_hex("0552", 7, 3)  # start bit 7, length 3: 010
+        assert val == 0x2, "Wrong extracted value, expected 0x2, got 0x%x" % val
+
+        val = extract_value_from_hex("9ff2", 8, 8)
+        assert val == 0x9f, "Wrong extracted value, expected 0x9f, got 0x%x" % val
+
+        val = extract_value_from_hex("0f521236", 12, 16)
+        assert val == 0xf521, "Wrong extracted value, expected 0xf521, got 0x%x" % val
+        print("OK")
+
+    # Fields definition and hex string used by test_hex_parser() and test_bytes_parser()
+    @staticmethod
+    def example_struct():
+        hex_string = "8fe37156"
+        hex_string += "f87ae5" + "31206162632031"  # sub struct 1 (second part is "1 abc 1" converted to hex)
+        hex_string += "a87ae3" + "32206162632032"  # sub struct 2 (second part is "2 abc 2" converted to hex)
+        hex_string += "f87ae5" + "33206162632033"  # sub struct 3 (second part is "3 abc 3" converted to hex)
+        hex_string += "11ff"
+        hex_string += "55727567756179"  # "Uruguay" converted to hex
+
+        # Warning: must be constructed this way because OrderedDict(arg1 =..., arg2=...) doesn't preserve ORDER
+        sub_struct_format = OrderedDict()
+        sub_struct_format["sub_field_1"] = TYPE_8_BITS
+        sub_struct_format["sub_field_2"] = (7, TYPE_16_BITS)
+        sub_struct_format["sub_field_3"] = (9, TYPE_16_BITS)
+        sub_struct_format["sub_field_4"] = (7*TYPE_8_BITS, TYPE_STRING)
+
+        fields = OrderedDict()
+
+        fields["field1"] = TYPE_8_BITS
+        fields["field2"] = (5, TYPE_8_BITS, lambda x: "ONE" if x == 1 else "NOT ONE")
+        fields["field3"] = (3, TYPE_8_BITS)
+        fields["field4"] = (12, TYPE_16_BITS, lambda x: x+1)
+        fields["field5"] = (4, TYPE_16_BITS)
+        fields["sub_struct_0"] = (sub_struct_format, TYPE_STRUCT)
+        fields["sub_struct_1"] = (sub_struct_format, TYPE_STRUCT)
+        fields["sub_struct_2"] = (sub_struct_format, TYPE_STRUCT)
+        fields["field6"] = TYPE_16_BITS
+        fields["field7"] = (7*TYPE_8_BITS, TYPE_STRING)
+        return fields, hex_string
+
+    @staticmethod
+    def test_hex_parser():
+        print("Testing parse_fields_from_hex()...")
+        fields, hex_string = BinaryParserTester.example_struct()
+
+        structure = parse_struct_from_hex(fields, hex_string)
+
+        assert structure["field1"] == 0x8f, "field1 wrong, expected 0x8f, got: 0x%x" % structure["field1"]
+        assert structure["field2"] == "NOT ONE", "field2 wrong, expected string \"NOT ONE\", got: 0b%o" % structure["field2"]
+        assert structure["field3"] == 0b111, "field3 wrong, expected 0b111, got: %d" % structure["field3"]
+        assert structure["field4"] == 0x671 + 1, "field4 wrong, expected 0x672, got: 0x%x" % structure["field4"]
+        assert structure["field5"] == 0x5, "field5 wrong, expected 0x5, got: 0x%x" % structure["field5"]
+
+        # sub_struct_0
+        assert structure["sub_struct_0"]["sub_field_1"] == 0xf8,\
+            "sub_struct_0/sub_field_1 wrong, expected 0xf8, got 0x%x" % structure["sub_struct_0"]["sub_field_1"]
+        assert structure["sub_struct_0"]["sub_field_2"] == 0x7a,\
+            "sub_struct_0/sub_field_2 wrong, expected 0x7a, got 0x%x" % structure["sub_struct_0"]["sub_field_2"]
+        assert structure["sub_struct_0"]["sub_field_3"] == (2*0xe5),\
+            "sub_struct_0/sub_field_3 wrong, expected 2*0xe5, got 0x%x" % structure["sub_struct_0"]["sub_field_3"]
+        assert structure["sub_struct_0"]["sub_field_4"] == "1 abc 1",\
+            "sub_struct_0/sub_field_4 wrong, expected \'1 abc 1\', got \'%s\'"\
+            % structure["sub_struct_0"]["sub_field_4"]
+
+        # sub_struct_1
+        assert structure["sub_struct_1"]["sub_field_1"] == 0xa8,\
+            "sub_struct_1/sub_field_1 wrong, expected 0xa8, got 0x%x" % structure["sub_struct_1"]["sub_field_1"]
+        assert structure["sub_struct_1"]["sub_field_2"] == 0x7a,\
+            "sub_struct_1/sub_field_2 wrong, expected 0x7a, got 0x%x" % structure["sub_struct_1"]["sub_field_2"]
+        assert structure["sub_struct_1"]["sub_field_3"] == (2*0xe3),\
+            "sub_struct_1/sub_field_3 wrong, expected 2*0xe3, got 0x%x" % structure["sub_struct_1"]["sub_field_3"]
+        assert structure["sub_struct_1"]["sub_field_4"] == "2 abc 2",\
+            "sub_struct_1/sub_field_4 wrong, expected \'2 abc 2\', got \'%s\'"\
+            % structure["sub_struct_1"]["sub_field_4"]
+
+        # sub_struct_2
+        assert structure["sub_struct_2"]["sub_field_1"] == 0xf8,\
+            "sub_struct_1/sub_struct_2 wrong, expected 0xf8, got 0x%x" % structure["sub_struct_2"]["sub_field_1"]
+        assert structure["sub_struct_2"]["sub_field_2"] == 0x7a,\
+            "sub_struct_2/sub_field_2 wrong, expected 0x7a, got 0x%x" % structure["sub_struct_2"]["sub_field_2"]
+        assert structure["sub_struct_2"]["sub_field_3"] == (2*0xe5),\
+            "sub_struct_2/sub_field_3 wrong, expected 2*0xe5, got 0x%x" % structure["sub_struct_2"]["sub_field_3"]
+        assert structure["sub_struct_2"]["sub_field_4"] == "3 abc 3",\
+            "sub_struct_2/sub_field_4 wrong, expected \'3 abc 3\', got \'%s\'"\
+            % structure["sub_struct_2"]["sub_field_4"]
+
+        # Last 2 fields
+        assert structure["field6"] == 0xff11, "field6 wrong, expected 0xff11, got: 0x%x" % structure["field6"]
+        assert structure["field7"] == "Uruguay",\
+            "field7 wrong, expected \'Uruguay\', got: \'%s\'"\
+            % structure["field7"]
+
+        print(structure)
+
+
+
+        print("OK")
+
+    @staticmethod
+    def test_bytes_parser():
+        print("Testing parse_struct_from_bytes()...")
+        fields, hex_string = BinaryParserTester.example_struct()
+        fields["field8"] = (3*TYPE_8_BITS, TYPE_ARRAY)
+        hex_string += "a1b2c3"
+
+        expected = parse_struct_from_hex(fields, hex_string)
+        structure = parse_struct_from_bytes(fields, bytes.fromhex(hex_string))
+        BinaryParserTester.assert_same_struct(expected, structure, "")
+        assert isinstance(structure["field8"], memoryview),\
+            "field8 wrong, expected memoryview, got: %s" % type(structure["field8"])
+        print("OK")
+
+    @staticmethod
+    def test_parse_batch():
+        print("Testing parse_batch()...")
+        import numpy as np
+
+        sub_struct_format = OrderedDict()
+        sub_struct_format["sub_field_1"] = (4, TYPE_8_BITS)
+        sub_struct_format["sub_field_2"] = (4, TYPE_8_BITS)
+        sub_struct_format["sub_field_3"] = (2*TYPE_8_BITS, TYPE_ARRAY)
+
+        fields = OrderedDict()
+        fields["field1"] = (3, TYPE_16_BITS)  # packed fields, 16 bits container
+        fields["field2"] = (13, TYPE_16_BITS)
+        fields["field3"] = (5, 24)  # packed fields, 24 bits container
+        fields["field4"] = (11, 24)
+        fields["field5"] = (8, 24)
+        fields["field6"] = (70, 72)  # container longer than 64 bits
+        fields["field7"] = (2, 72)
+        fields["field8"] = TYPE_32_BITS
+        fields["field9"] = 64
+        fields["field10"] = (3*TYPE_8_BITS, TYPE_ARRAY)
+        fields["field11"] = (4*TYPE_8_BITS, TYPE_STRING)
+        fields["sub_struct"] = (sub_struct_format, TYPE_STRUCT)
+
+        frame_length = 2 + 3 + 9 + 4 + 8 + 3 + 4 + 3
+        rand = random.Random(1)
+        buffers = [bytes(rand.getrandbits(8) for _ in range(frame_length)) for _ in range(50)]
+        buffers.append(b"\xff" * frame_length)  # all bits set (highest values, sign bits)
+        columns = parse_batch(fields, buffers)
+
+        for frame_n, buffer in enumerate(buffers):
+            BinaryParserTester.assert_same_row(parse_struct_from_bytes(fields, buffer), columns, frame_n, "")
+
+        # Numeric columns use the smallest unsigned dtype for each field (Python integers above 64 bits)
+        expected_dtypes = {"field1": np.uint8, "field2": np.uint16, "field3": np.uint8, "field4": np.uint16,
+                           "field5": np.uint8, "field6": object, "field7": np.uint8, "field8": np.uint32,
+                           "field9": np.uint64}
+        for name, dtype in expected_dtypes.items():
+            assert columns[name].dtype == dtype,\
+                "%s dtype wrong, expected %s, got: %s" % (name, np.dtype(dtype), columns[name].dtype)
+
+        try:
+            parse_batch(fields, buffers + [buffers[0][0:-1]])
+            raise RuntimeError("Shall throw AssertionError because a buffer is shorter than the structure")
+        except AssertionError:
+            pass
+        print("OK")
+
+    # Compare row frame_n of the columns returned by parse_batch() with the struct parsed from the same buffer
+    @staticmethod
+    def assert_same_row(expected, columns, frame_n, path):
+        assert list(expected) == list(columns),\
+            "%s fields wrong, expected %s, got: %s" % (path, list(expected), list(columns))
+        for name in expected:
+            if isinstance(expected[name], dict):
+                BinaryParserTester.assert_same_row(expected[name], columns[name], frame_n, path + name + "/")
+                continue
+            if isinstance(expected[name], memoryview):
+                value, expected_value = columns[name][frame_n].tobytes(), expected[name].tobytes()
+            elif isinstance(expected[name], str):
+                value, expected_value = columns[name][frame_n], expected[name]
+            else:
+                value, expected_value = int(columns[name][frame_n]), expected[name]
+            assert value == expected_value,\
+                "%s%s wrong in frame %d, expected %s, got: %s" % (path, name, frame_n, expected_value, value)
+
+    # Compare a struct parsed from bytes with the same struct parsed from hex (arrays are memoryviews / hex strings)
+    @staticmethod
+    def assert_same_struct(expected, structure, path):
+        assert list(expected) == list(structure),\
+            "%s fields wrong, expected %s, got: %s" % (path, list(expected), list(structure))
+        for name in expected:
+            if isinstance(expected[name], dict):
+                BinaryParserTester.assert_same_struct(expected[name], structure[name], path + name + "/")
+            elif isinstance(structure[name], memoryview):
+                assert structure[name].hex() == expected[name],\
+                    "%s%s wrong, expected %s, got: %s" % (path, name, expected[name], structure[name].hex())
+            else:
+                assert structure[name] == expected[name],\
+                    "%s%s wrong, expected %s, got: %s" % (path, name, expected[name], structure[name])
+
+
+BinaryParserTester.test_all()
@@ -15,11 +15,12 @@ try:
     # Wait for trigger and retrieve data (Volts / seconds)
     time_s, ch1_v, ch2_v = device.get_single_shoot(trigger_channel=1, trigger_level=1.5,
                                                    trigger_slope_down=True, time_scale="200us",
-                                                   channel_1_y_scale=1, channel_2_y_scale=1)
+                                                   channel_1_y_scale=1, channel_2_y_scale=1,
+                                                   samples_format="BYTE")
 
     # Create excel file
     excel_file = "oscilloscope_out_%s.xlsx" % date.today()
-    time_us = [t*1e6 for t in time_s]
+    time_us = time_s * 1e6  # numpy array (see get_single_shoot())
     Excel.plot_signals(excel_file, time_us, ch1_v, 'Channel 1', ch2_v, 'Channel 2',
                        x_label='Time (us)', y_label='Voltage (V)', title="Signal Data")
     # Open excel file